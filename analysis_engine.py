@@ -5,9 +5,13 @@ Integrates ML model for real prob_up predictions.
 Falls back to 0.5 when model not available.
 """
 
+import sys
+
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, asdict
+from datetime import date
 from typing import Dict, Optional
 from functools import lru_cache
 
@@ -15,17 +19,20 @@ import data_manager
 
 
 # --- Constants ---
-TOP_STOCKS = [
+# Tickers are interned so the same string object is shared across sectors
+# and hashes by pointer in later set/dict lookups; tuples keep the lists
+# immutable.
+TOP_STOCKS = tuple(sys.intern(t) for t in [
     "2330.TW", "2317.TW", "2454.TW", "2308.TW", "2382.TW",
     "2881.TW", "2882.TW", "2891.TW", "2886.TW",
     "0050.TW", "0056.TW", "00878.TW"
-]
+])
 
 SECTOR_MAP = {
     "全部 (All)": TOP_STOCKS,
-    "半導體 (Semi)": ["2330.TW", "2454.TW", "2303.TW", "2308.TW"],
-    "金融 (Finance)": ["2881.TW", "2882.TW", "2886.TW", "2891.TW"],
-    "ETF": ["0050.TW", "0056.TW", "00878.TW", "00919.TW"]
+    "半導體 (Semi)": tuple(sys.intern(t) for t in ["2330.TW", "2454.TW", "2303.TW", "2308.TW"]),
+    "金融 (Finance)": tuple(sys.intern(t) for t in ["2881.TW", "2882.TW", "2886.TW", "2891.TW"]),
+    "ETF": tuple(sys.intern(t) for t in ["0050.TW", "0056.TW", "00878.TW", "00919.TW"])
 }
 
 
@@ -46,6 +53,39 @@ class SignalSnapshot:
         return asdict(self)
 
 
+# --- Scan Snapshot Cache (per trading day) ---
+# Sectors overlap heavily (e.g. "2330.TW" appears in 全部 and 半導體), so
+# flipping sectors in one session re-scans the same tickers. Snapshots are
+# memoized for the day; a repeat scan becomes a dict lookup.
+_SNAPSHOT_CACHE: Dict[tuple, SignalSnapshot] = {}
+
+# OHLCV frames fetched by a scan, kept so drilling into a recommendation
+# card renders from memory instead of re-downloading the same history.
+# Keyed by (ticker, period) -> (day, df).
+_SCAN_OHLCV_CACHE: Dict[tuple, tuple] = {}
+
+
+def _prune_stale_caches(today: date):
+    """Drop prior days' entries so the scan caches don't grow unbounded."""
+    for key in [k for k in _SNAPSHOT_CACHE if k[4] != today]:
+        del _SNAPSHOT_CACHE[key]
+    for key in [k for k, (day, _) in _SCAN_OHLCV_CACHE.items() if day != today]:
+        del _SCAN_OHLCV_CACHE[key]
+
+
+# --- Info/Name Lookup Caching (per trading day) ---
+@lru_cache(maxsize=512)
+def _info_cached(ticker: str, day: date) -> Dict:
+    """Fetch stock info once per ticker per day."""
+    return data_manager.fetch_stock_info(ticker)
+
+
+@lru_cache(maxsize=512)
+def _name_cached(ticker: str, day: date) -> str:
+    """Resolve Chinese stock name once per ticker per day."""
+    return data_manager.get_stock_name(ticker)
+
+
 # --- Model Loading with Caching ---
 @lru_cache(maxsize=4)
 def load_model_cached(model_path: str):
@@ -70,51 +110,67 @@ def compute_key_metrics(ohlcv_df: pd.DataFrame) -> Dict:
     
     if ohlcv_df is None or ohlcv_df.empty or len(ohlcv_df) < 2:
         return metrics
-    
-    close = ohlcv_df['Close']
-    volume = ohlcv_df['Volume']
-    returns = close.pct_change()
-    
-    if len(returns) >= 2:
-        metrics["return_1d"] = round(returns.iloc[-1] * 100, 2)
-    
+
+    # Work on raw numpy arrays - only the latest scalar of each metric is
+    # needed, so avoid allocating intermediate pandas Series
+    close = np.asarray(ohlcv_df['Close'].values, dtype=np.float64)
+    volume = np.asarray(ohlcv_df['Volume'].values, dtype=np.float64)
+
+    metrics["return_1d"] = round(float(close[-1] / close[-2] - 1) * 100, 2)
+
     if len(close) >= 6:
-        metrics["return_5d"] = round((close.iloc[-1] / close.iloc[-6] - 1) * 100, 2)
-    
-    if len(returns) >= 20:
-        metrics["volatility_20d"] = round(returns.tail(20).std() * 100, 2)
-    
+        metrics["return_5d"] = round(float(close[-1] / close[-6] - 1) * 100, 2)
+
+    # Volatility from log-returns over the last 21 closes only - no
+    # full-length pct_change allocation
+    if len(close) >= 20:
+        log_rets = np.diff(np.log(close[-21:]))
+        metrics["volatility_20d"] = round(float(log_rets.std(ddof=1)) * 100, 2)
+
     if len(volume) >= 20:
-        vol_avg_20 = volume.tail(20).mean()
+        vol_avg_20 = float(volume[-20:].mean())
         if vol_avg_20 > 0:
-            metrics["volume_ratio_20d"] = round(volume.iloc[-1] / vol_avg_20, 2)
-    
+            metrics["volume_ratio_20d"] = round(float(volume[-1]) / vol_avg_20, 2)
+
     return metrics
 
 
 # --- Signal Snapshot Generator ---
-def get_signal_snapshot(ticker: str, period: str = "6mo", 
-                        model_path: str = None, add_kd: bool = False) -> tuple:
+def get_signal_snapshot(ticker: str, period: str = "6mo",
+                        model_path: str = None, add_kd: bool = False,
+                        ohlcv_df: pd.DataFrame = None,
+                        payload: dict = None,
+                        return_df: bool = True) -> tuple:
     """
     Generate SignalSnapshot with real prob_up if model available.
-    
+
     Args:
         ticker: Stock ticker
         period: Data period
         model_path: Path to saved model (optional)
         add_kd: Whether to use KD features
-        
+        ohlcv_df: Prefetched OHLCV data (skips the per-ticker fetch)
+        payload: Pre-loaded model payload (skips the per-call cache lookup)
+        return_df: Whether to return ohlcv_df/info (scans pass False so
+            frames are released as soon as the snapshot is built)
+
     Returns:
-        (SignalSnapshot, ohlcv_df, info_dict)
+        (SignalSnapshot, ohlcv_df, info_dict) - the last two are None
+        when return_df is False
     """
-    # Fetch data
-    ohlcv_df, _ = data_manager.fetch_stock_history(ticker, period=period)
-    info = data_manager.fetch_stock_info(ticker)
-    
+    # Fetch data (unless prefetched, e.g. by a batch scan)
+    if ohlcv_df is None:
+        cached = _SCAN_OHLCV_CACHE.get((data_manager.validate_ticker(ticker), period))
+        if cached is not None and cached[0] == date.today():
+            ohlcv_df = cached[1]
+        else:
+            ohlcv_df, _ = data_manager.fetch_stock_history(ticker, period=period)
+    info = _info_cached(ticker, date.today())
+
     # Get stock name
     name = info.get('longName', info.get('shortName', ''))
     if not name:
-        name = data_manager.get_stock_name(ticker)
+        name = _name_cached(ticker, date.today())
     
     # Last close price
     last_close = 0.0
@@ -128,18 +184,19 @@ def get_signal_snapshot(ticker: str, period: str = "6mo",
     prob_up = 0.5
     model_used = False
     
-    if model_path:
+    if payload is None and model_path:
         payload = load_model_cached(model_path)
-        if payload is not None:
-            try:
-                import model_trainer
-                prob_up = model_trainer.predict_proba_latest(
-                    payload, ohlcv_df, add_kd=add_kd
-                )
-                model_used = True
-            except Exception as e:
-                print(f"[Predict] Error: {e}")
-                prob_up = 0.5
+
+    if payload is not None:
+        try:
+            import model_trainer
+            prob_up = model_trainer.predict_proba_latest(
+                payload, ohlcv_df, add_kd=add_kd
+            )
+            model_used = True
+        except Exception as e:
+            print(f"[Predict] Error: {e}")
+            prob_up = 0.5
     
     # Direction from prob_up
     if prob_up >= 0.5:
@@ -161,6 +218,9 @@ def get_signal_snapshot(ticker: str, period: str = "6mo",
         model_used=model_used
     )
     
+    if not return_df:
+        return snapshot, None, None
+
     return snapshot, ohlcv_df, info
 
 
@@ -182,33 +242,95 @@ def get_stock_recommendations(sector: str = "全部 (All)", model_path: str = No
         dict with 'top_picks' and 'warnings' lists
     """
     target_list = SECTOR_MAP.get(sector, TOP_STOCKS)
-    
-    results = []
-    
+    today = date.today()
+    _prune_stale_caches(today)
+
+    # Columnar accumulators - ranked with one numpy argsort instead of
+    # sorting a list of dicts
+    tickers, names, probs, directions, prices = [], [], [], [], []
+
+    def _collect(ticker, snapshot):
+        if snapshot.last_close > 0:
+            tickers.append(ticker)
+            names.append(snapshot.name)
+            probs.append(snapshot.prob_up)
+            directions.append(snapshot.direction)
+            prices.append(snapshot.last_close)
+
+    # Serve tickers already scanned today from the snapshot cache
+    pending = []
     for ticker in target_list:
-        try:
-            snapshot, _, _ = get_signal_snapshot(
-                ticker, period=period, model_path=model_path, add_kd=add_kd
-            )
-            if snapshot.last_close > 0:
-                results.append({
-                    'ticker': ticker,
-                    'name': snapshot.name,
-                    'prob_up': snapshot.prob_up,
-                    'direction': snapshot.direction,
-                    'price': snapshot.last_close
-                })
-        except Exception as e:
-            print(f"[Scan] Skipping {ticker}: {e}")
+        cached = _SNAPSHOT_CACHE.get((ticker, period, model_path, add_kd, today))
+        if cached is not None:
+            _collect(ticker, cached)
+        else:
+            pending.append(ticker)
+
+    if pending:
+        # Batch-fetch OHLCV for the remaining tickers in one yfinance call
+        prefetched = data_manager.fetch_stock_history_batch(pending, period=period)
+
+        # Keep the frames around for same-day drilldowns
+        for t, df in prefetched.items():
+            if df is not None and not df.empty:
+                _SCAN_OHLCV_CACHE[(t, period)] = (today, df)
+
+        # Load the model payload once and share it across all workers
+        payload = load_model_cached(model_path) if model_path else None
+
+        # Per-ticker work (info fetch + prediction) is I/O-bound - run in threads
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            futures = {
+                executor.submit(
+                    get_signal_snapshot, ticker, period=period,
+                    model_path=model_path, add_kd=add_kd,
+                    ohlcv_df=prefetched.get(ticker), payload=payload,
+                    return_df=False
+                ): ticker
+                for ticker in pending
+            }
+
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    snapshot, _, _ = future.result()
+                    # Only memoize successful snapshots - a transient
+                    # fetch failure (last_close == 0) should be retried
+                    # on the next scan, not served all day
+                    if snapshot.last_close > 0:
+                        _SNAPSHOT_CACHE[(ticker, period, model_path, add_kd, today)] = snapshot
+                    _collect(ticker, snapshot)
+                except Exception as e:
+                    print(f"[Scan] Skipping {ticker}: {e}")
+                    continue
+
+    if not probs:
+        return {'top_picks': [], 'warnings': []}
+
+    # Rank by prob_up descending
+    prob_arr = np.asarray(probs, dtype=np.float64)
+    order = np.argsort(-prob_arr, kind='stable')
+
+    # Top picks: prob_up >= 0.60; warnings: prob_up <= 0.40
+    top_picks = []
+    warnings = []
+
+    for i in order:
+        p = prob_arr[i]
+
+        if p >= 0.60 and len(top_picks) < top_n:
+            bucket = top_picks
+        elif p <= 0.40 and len(warnings) < 5:
+            bucket = warnings
+        else:
             continue
-    
-    # Sort by prob_up descending
-    results.sort(key=lambda x: x['prob_up'], reverse=True)
-    
-    # Top picks: prob_up >= 0.60
-    top_picks = [r for r in results if r['prob_up'] >= 0.60][:top_n]
-    
-    # Warnings: prob_up <= 0.40
-    warnings = [r for r in results if r['prob_up'] <= 0.40][:5]
-    
+
+        bucket.append({
+            'ticker': tickers[i],
+            'name': names[i],
+            'prob_up': probs[i],
+            'direction': directions[i],
+            'price': prices[i]
+        })
+
     return {'top_picks': top_picks, 'warnings': warnings}
@@ -4,12 +4,18 @@ app.py - 台股 AI 決策支援系統
 訊號儀表板：即時預測機率與回測摘要
 """
 
+import re
+
 import streamlit as st
 import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import SimpleNamespace
 
 import data_manager
 import analysis_engine
+import backtest_engine
 
 # --- 模型路徑設定 (如需更換模型請修改此處) ---
 DEFAULT_MODEL_PATH = "models/rf_baseline.joblib"
@@ -77,8 +83,174 @@ UI_TEXT = {
     "disclaimer": "⚠️ 投資警語：本系統僅供參考，不構成投資建議。投資有風險，請審慎評估。"
 }
 
-# --- 啟動：檢查股票清單 ---
-@st.cache_resource
+# 以屬性存取取代每次 rerun 的 dict 雜湊查找
+T = SimpleNamespace(**UI_TEXT)
+
+# 方向顯示對應（模組層級，不隨 render 重建）
+DIRECTION_MAP = {"UP": "🟢 偏多", "DOWN": "🔴 偏空"}
+
+
+# 代號輸入正規化（模組層級預編譯，穩定快取鍵）
+_TICKER_RE = re.compile(r'^\s*(\d{4,6})(?:\.(tw|two))?\s*$', re.IGNORECASE)
+
+
+def _normalize_ticker(raw):
+    """正規化輸入：純數字代號去除空白/大小寫差異，名稱查詢原樣 strip"""
+    m = _TICKER_RE.match(raw)
+    if m:
+        code, suffix = m.group(1), m.group(2)
+        return f"{code}.{suffix.upper()}" if suffix else code
+    return raw.strip()
+
+
+def _fmt_metric(val, suffix="%"):
+    """指標格式化：無資料時顯示替代文字"""
+    return f"{val:.2f}{suffix}" if val is not None else T.no_data
+
+# --- 期間對應的日數（用於切出檢視區間） ---
+PERIOD_DAYS = {"3mo": 90, "6mo": 180, "1y": 365, "2y": 730, "5y": 1825}
+
+
+def _slice_tail_days(df, days):
+    """取近 N 日的資料切片"""
+    if df.empty:
+        return df
+    cutoff = df.index[-1] - pd.Timedelta(days=days)
+    return df.loc[df.index >= cutoff]
+
+
+# --- 快取層：同 (代號, 期間, 模型) 的重跑直接回傳記憶體結果 ---
+class _NoDataError(RuntimeError):
+    """抓不到資料時拋出；st.cache_data 不快取例外，下次 rerun 會重抓"""
+
+
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60)
+def _cached_history_fused(ticker, period):
+    """
+    一次抓取 max(使用者期間, 1y) 的資料。
+
+    回傳 (完整 df, 檢視 df)：完整 df 供回測使用，檢視 df 為使用者
+    選擇期間的切片，避免儀表板與回測各抓一次。
+    """
+    days = PERIOD_DAYS.get(period, 180)
+    fetch_period = period if days >= 365 else "1y"
+
+    full_df, _ = data_manager.fetch_stock_history(ticker, period=fetch_period)
+
+    # 空結果不進快取（可能只是暫時抓不到），否則 24 小時內
+    # 這個代號都會顯示查無資料
+    if full_df.empty:
+        raise _NoDataError(ticker)
+
+    if days >= 365:
+        view_df = full_df
+    else:
+        view_df = _slice_tail_days(full_df, days)
+
+    return full_df, view_df
+
+
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60)
+def _cached_snapshot(ticker, period, model_path):
+    """快取訊號快照，避免每次 rerun 重新抓取與推論"""
+    _, view_df = _cached_history_fused(ticker, period)
+    return analysis_engine.get_signal_snapshot(
+        ticker, period=period, model_path=model_path, ohlcv_df=view_df
+    )
+
+
+def _lttb_indices(y, n_out):
+    """LTTB (Largest-Triangle-Three-Buckets) 降採樣索引"""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+
+    every = (n - 2) / (n_out - 2)
+    a = 0
+
+    for i in range(n_out - 2):
+        # 下一個 bucket 的平均點
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        # 目前 bucket 中三角形面積最大的點
+        rng_start = int(i * every) + 1
+        rng_end = int((i + 1) * every) + 1
+        xs = x[rng_start:rng_end]
+        ys = y[rng_start:rng_end]
+
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = rng_start + int(area.argmax())
+        idx[i + 1] = a
+
+    return idx
+
+
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60)
+def _downsampled_chart(ohlcv_df, n_out=500):
+    """收盤價走勢圖資料：超過 n_out 點時以 LTTB 降採樣"""
+    close = ohlcv_df['Close']
+    idx = _lttb_indices(close.values, n_out)
+    # float32 足夠顯示精度，序列化到前端的位元組數減半
+    chart_df = close.iloc[idx].astype(np.float32).to_frame()
+    if not isinstance(chart_df.index, pd.DatetimeIndex):
+        chart_df.index = pd.to_datetime(chart_df.index)
+    return chart_df
+
+
+@st.cache_resource(show_spinner=False)
+def _get_model(path):
+    """模型以 process 級單例保存，不隨 rerun 重新反序列化"""
+    return analysis_engine.load_model_cached(path)
+
+
+# --- 背景預抓：在使用者打字時先抓可能的補全代號 ---
+@st.cache_resource(show_spinner=False)
+def _prefetch_pool():
+    """預抓用的共用執行緒池"""
+    return ThreadPoolExecutor(max_workers=4)
+
+
+@st.cache_data(show_spinner=False)
+def _universe_codes():
+    """股票清單代號（預抓補全比對用）"""
+    uni = data_manager.load_universe()
+    return [] if uni is None else uni['code'].tolist()
+
+
+def _prefetch_candidates(partial, period, limit=4):
+    """
+    輸入達 3 碼數字時，背景預抓字首相符的代號。
+
+    抓取結果寫入磁碟快取，使用者打完整代號時即為快取命中，
+    以打字間隔隱藏網路延遲。
+    """
+    if not partial.isdigit() or len(partial) < 3:
+        return
+
+    submitted = st.session_state.setdefault("prefetched", set())
+    pool = _prefetch_pool()
+
+    matches = [c for c in _universe_codes()
+               if c.startswith(partial) and c != partial][:limit]
+
+    for code in matches:
+        key = (code, period)
+        if key not in submitted:
+            submitted.add(key)
+            pool.submit(data_manager.fetch_stock_history,
+                        f"{code}.TW", period=period)
+
+
+# --- 啟動：檢查股票清單（每個 session 只檢查一次） ---
 def ensure_universe():
     """首次啟動時自動建立股票清單"""
     if not data_manager.UNIVERSE_PATH.exists():
@@ -89,7 +261,11 @@ def ensure_universe():
             return False, f"無法建立股票清單：{e}"
     return True, "股票清單已載入"
 
-universe_ok, universe_msg = ensure_universe()
+if "universe_checked" not in st.session_state:
+    universe_ok, universe_msg = ensure_universe()
+    st.session_state["universe_checked"] = (universe_ok, universe_msg)
+
+universe_ok, universe_msg = st.session_state["universe_checked"]
 if not universe_ok:
     st.warning(f"⚠️ {universe_msg}")
 
@@ -98,155 +274,128 @@ model_path = DEFAULT_MODEL_PATH
 model_exists = Path(model_path).exists()
 
 # --- 側邊欄 ---
-st.sidebar.title(UI_TEXT["sidebar_title"])
+st.sidebar.title(T.sidebar_title)
 st.sidebar.markdown("---")
 
 # 股票代號輸入
-ticker_input = st.sidebar.text_input(UI_TEXT["ticker_label"], value="2330")
+ticker_input = st.sidebar.text_input(T.ticker_label, value="2330")
+ticker_key = _normalize_ticker(ticker_input)
 
 # 資料期間選擇
-period = st.sidebar.selectbox(UI_TEXT["period_label"], ["3mo", "6mo", "1y", "2y", "5y"], index=1)
+period = st.sidebar.selectbox(T.period_label, ["3mo", "6mo", "1y", "2y", "5y"], index=1)
+
+# 部分輸入時背景預抓可能的補全
+_prefetch_candidates(ticker_key, period)
 
 st.sidebar.markdown("---")
 
 # 模型狀態顯示
 if model_exists:
-    st.sidebar.success(UI_TEXT["model_loaded"])
+    st.sidebar.success(T.model_loaded)
 else:
-    st.sidebar.warning(UI_TEXT["model_not_found"])
+    st.sidebar.warning(T.model_not_found)
 
 st.sidebar.markdown("---")
 
 # 管理工具
-st.sidebar.caption(UI_TEXT["admin_section"])
+st.sidebar.caption(T.admin_section)
 col1, col2 = st.sidebar.columns(2)
 with col1:
-    if st.button(UI_TEXT["build_universe"], use_container_width=True):
+    if st.button(T.build_universe, use_container_width=True):
         with st.spinner("建立中..."):
             try:
                 df = data_manager.build_universe()
-                st.sidebar.success(UI_TEXT["universe_built"].format(count=len(df)))
+                st.sidebar.success(T.universe_built.format(count=len(df)))
             except Exception as e:
                 st.sidebar.error(str(e))
 
 with col2:
-    if st.button(UI_TEXT["clear_cache"], use_container_width=True):
+    if st.button(T.clear_cache, use_container_width=True):
         st.cache_data.clear()
+        _get_model.clear()
         analysis_engine.load_model_cached.cache_clear()
-        st.sidebar.success(UI_TEXT["cache_cleared"])
+        # 同時清掉 session 狀態，否則 rerun 時渲染閘門
+        # 會直接重用上次結果，清快取等於沒作用
+        st.session_state.pop("last_key", None)
+        st.session_state.pop("last_result", None)
+        st.session_state.pop("prefetched", None)
+        st.sidebar.success(T.cache_cleared)
 
 # 投資警語
 st.sidebar.markdown("---")
-st.sidebar.caption(UI_TEXT["disclaimer"])
+st.sidebar.caption(T.disclaimer)
 
 # --- 主畫面 ---
-st.title(UI_TEXT["app_title"])
+st.title(T.app_title)
 
 if ticker_input:
     try:
-        # 取得訊號快照
-        snapshot, ohlcv_df, info = analysis_engine.get_signal_snapshot(
-            ticker_input, 
-            period=period,
-            model_path=model_path if model_exists else None
-        )
+        # 取得訊號快照（同一組查詢條件直接重用上次結果，
+        # 不相關的按鈕互動不會重新查詢）
+        render_key = (ticker_key, period, model_exists)
+
+        if st.session_state.get("last_key") == render_key:
+            snapshot, ohlcv_df, info = st.session_state["last_result"]
+        else:
+            snapshot, ohlcv_df, info = _cached_snapshot(
+                ticker_key,
+                period,
+                model_path if model_exists else None
+            )
+            st.session_state["last_key"] = render_key
+            st.session_state["last_result"] = (snapshot, ohlcv_df, info)
         
         if ohlcv_df.empty:
-            st.error(UI_TEXT["error_no_data"])
+            st.error(T.error_no_data)
         else:
             # --- 標題 ---
             st.subheader(f"{snapshot.name} ({snapshot.ticker})")
             
             # 模型狀態
             if snapshot.model_used:
-                st.caption(UI_TEXT["using_model"])
+                st.caption(T.using_model)
             else:
-                st.caption(UI_TEXT["fallback_mode"])
-            
-            # --- 訊號儀表板 ---
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric(
-                    label=UI_TEXT["last_close"],
-                    value=f"${snapshot.last_close:,.2f}"
-                )
-            
-            with col2:
-                direction_map = {"UP": "🟢 偏多", "DOWN": "🔴 偏空"}
-                direction_text = direction_map.get(snapshot.direction, "⚪ 中性")
-                st.metric(
-                    label=UI_TEXT["direction"],
-                    value=direction_text
-                )
-            
-            with col3:
-                st.metric(
-                    label=UI_TEXT["prob_up"],
-                    value=f"{snapshot.prob_up:.1%}"
-                )
-            
-            with col4:
-                conf_pct = snapshot.confidence * 100
-                st.metric(
-                    label=UI_TEXT["confidence"],
-                    value=f"{conf_pct:.1f}%"
-                )
+                st.caption(T.fallback_mode)
             
+            # --- 訊號儀表板（單一表格取代 4 個 metric 元件） ---
+            dash_df = pd.DataFrame({
+                T.last_close: [f"${snapshot.last_close:,.2f}"],
+                T.direction: [DIRECTION_MAP.get(snapshot.direction, "⚪ 中性")],
+                T.prob_up: [f"{snapshot.prob_up:.1%}"],
+                T.confidence: [f"{snapshot.confidence * 100:.1f}%"],
+            })
+            st.dataframe(dash_df, hide_index=True, use_container_width=True)
+
             # 信心分數進度條
             st.progress(snapshot.confidence)
             
             st.markdown("---")
             
             # --- 關鍵指標 ---
-            st.subheader(UI_TEXT["key_metrics"])
+            st.subheader(T.key_metrics)
             
             metrics = snapshot.key_metrics
-            mcol1, mcol2, mcol3, mcol4 = st.columns(4)
-            
-            with mcol1:
-                val = metrics.get("return_1d")
-                st.metric(
-                    label=UI_TEXT["return_1d"],
-                    value=f"{val:.2f}%" if val is not None else UI_TEXT["no_data"],
-                    delta=f"{val:.2f}%" if val is not None else None
-                )
-            
-            with mcol2:
-                val = metrics.get("return_5d")
-                st.metric(
-                    label=UI_TEXT["return_5d"],
-                    value=f"{val:.2f}%" if val is not None else UI_TEXT["no_data"]
-                )
-            
-            with mcol3:
-                val = metrics.get("volatility_20d")
-                st.metric(
-                    label=UI_TEXT["volatility_20d"],
-                    value=f"{val:.2f}%" if val is not None else UI_TEXT["no_data"]
-                )
-            
-            with mcol4:
-                val = metrics.get("volume_ratio_20d")
-                st.metric(
-                    label=UI_TEXT["volume_ratio"],
-                    value=f"{val:.2f}x" if val is not None else UI_TEXT["no_data"]
-                )
+            metrics_df = pd.DataFrame({
+                T.return_1d: [_fmt_metric(metrics.get("return_1d"))],
+                T.return_5d: [_fmt_metric(metrics.get("return_5d"))],
+                T.volatility_20d: [_fmt_metric(metrics.get("volatility_20d"))],
+                T.volume_ratio: [_fmt_metric(metrics.get("volume_ratio_20d"), "x")],
+            })
+            st.dataframe(metrics_df, hide_index=True, use_container_width=True)
             
             st.markdown("---")
             
             # --- 回測摘要 ---
-            st.subheader(UI_TEXT["backtest_title"])
+            st.subheader(T.backtest_title)
             
             if model_exists:
                 try:
-                    import backtest_engine
-                    
-                    # 取得近一年資料
-                    ohlcv_1y, _ = data_manager.fetch_stock_history(ticker_input, period="1y")
+                    # 取得近一年資料（重用已抓取的完整區間）
+                    ohlcv_full, _ = _cached_history_fused(ticker_key, period)
+                    ohlcv_1y = _slice_tail_days(ohlcv_full, 365)
                     
                     if not ohlcv_1y.empty:
-                        payload = analysis_engine.load_model_cached(model_path)
+                        payload = _get_model(model_path)
                         
                         if payload:
                             bt_result = backtest_engine.run_backtest(
@@ -255,69 +404,53 @@ if ticker_input:
                             )
                             
                             if bt_result.get('error'):
-                                st.warning(UI_TEXT["backtest_error"].format(error=bt_result['error']))
+                                st.warning(T.backtest_error.format(error=bt_result['error']))
                             else:
-                                bcol1, bcol2, bcol3, bcol4 = st.columns(4)
-                                
-                                with bcol1:
-                                    ret = bt_result['total_return']
-                                    st.metric(
-                                        label=UI_TEXT["total_return"],
-                                        value=f"{ret:.2f}%",
-                                        delta=f"{ret:.2f}%"
-                                    )
-                                
-                                with bcol2:
-                                    st.metric(
-                                        label=UI_TEXT["win_rate"],
-                                        value=f"{bt_result['win_rate']:.1f}%"
-                                    )
-                                
-                                with bcol3:
-                                    st.metric(
-                                        label=UI_TEXT["max_drawdown"],
-                                        value=f"{bt_result['max_drawdown']:.2f}%"
-                                    )
-                                
-                                with bcol4:
-                                    st.metric(
-                                        label=UI_TEXT["trades"],
-                                        value=bt_result['num_trades']
-                                    )
+                                bt_df = pd.DataFrame({
+                                    T.total_return: [f"{bt_result['total_return']:.2f}%"],
+                                    T.win_rate: [f"{bt_result['win_rate']:.1f}%"],
+                                    T.max_drawdown: [f"{bt_result['max_drawdown']:.2f}%"],
+                                    T.trades: [bt_result['num_trades']],
+                                })
+                                st.dataframe(bt_df, hide_index=True, use_container_width=True)
                         else:
                             st.info("模型載入失敗，已改用預設值")
                     else:
-                        st.info(UI_TEXT["backtest_no_data"])
+                        st.info(T.backtest_no_data)
                         
                 except Exception as e:
-                    st.warning(UI_TEXT["backtest_error"].format(error=str(e)))
+                    st.warning(T.backtest_error.format(error=str(e)))
             else:
-                st.info(UI_TEXT["backtest_no_model"])
+                st.info(T.backtest_no_model)
             
             st.markdown("---")
             
             # --- 收盤價走勢圖 ---
-            st.subheader(UI_TEXT["chart_title"])
-            
-            chart_df = ohlcv_df[['Close']].copy()
-            chart_df.index = pd.to_datetime(chart_df.index)
+            st.subheader(T.chart_title)
             
-            st.line_chart(chart_df)
+            st.line_chart(_downsampled_chart(ohlcv_df))
             
             st.markdown("---")
             
             # --- 資料預覽 ---
-            st.subheader(UI_TEXT["data_preview"])
+            st.subheader(T.data_preview)
             
-            preview_df = ohlcv_df.tail(20).copy()
-            preview_df.index = preview_df.index.strftime('%Y-%m-%d')
-            preview_df = preview_df.round(2)
-            preview_df.columns = ['開盤', '最高', '最低', '收盤', '成交量']
+            # 單次投影：一次配置完成取尾/四捨五入/欄名對應
+            tail = ohlcv_df.iloc[-20:]
+            preview_df = pd.DataFrame({
+                '開盤': np.round(tail['Open'].values, 2),
+                '最高': np.round(tail['High'].values, 2),
+                '最低': np.round(tail['Low'].values, 2),
+                '收盤': np.round(tail['Close'].values, 2),
+                '成交量': np.round(tail['Volume'].values, 2),
+            }, index=tail.index.strftime('%Y-%m-%d'))
             
             st.dataframe(preview_df, use_container_width=True)
             
+    except _NoDataError:
+        st.error(T.error_no_data)
     except Exception as e:
-        st.error(UI_TEXT["error_general"].format(error=str(e)))
+        st.error(T.error_general.format(error=str(e)))
 
 else:
-    st.info(UI_TEXT["input_hint"])
+    st.info(T.input_hint)
@@ -6,11 +6,178 @@ Probability-driven backtest with buy/sell thresholds.
 
 import pandas as pd
 import numpy as np
+from collections import namedtuple
+from numba import njit
 
 import feature_engineering
 import model_trainer
 
 
+# Normalized model payload: unpack the dict-or-estimator input once at
+# the entry point instead of re-inspecting it on the hot path
+Payload = namedtuple('Payload', ['model', 'feature_cols'])
+
+
+def _normalize_payload(model_or_payload, add_kd: bool = False) -> Payload:
+    """Normalize a payload dict or bare estimator into a Payload."""
+    if isinstance(model_or_payload, dict):
+        return Payload(model_or_payload.get('model'),
+                       model_or_payload.get('feature_cols'))
+    return Payload(model_or_payload,
+                   feature_engineering.get_feature_columns(add_kd))
+
+
+@njit(cache=True, fastmath=True)
+def _simulate(close, prob_up, buy_threshold, sell_threshold):
+    """
+    Compiled buy/sell state machine.
+
+    One native pass over the bars builds the equity curve and per-trade
+    returns together. The position state is inherently sequential, so a
+    compiled loop beats chaining several full-length array passes.
+
+    Returns:
+        (pv, trade_returns) - equity curve (flat while not holding) and
+        the return of each closed trade
+    """
+    n = close.shape[0]
+    pv = np.empty(n, dtype=np.float64)
+    pv[0] = 1.0
+    trade_returns = np.empty(n, dtype=np.float64)
+    num_trades = 0
+
+    holding = False
+    entry_price = 0.0
+
+    for i in range(n - 1):
+        p = prob_up[i]
+
+        if not holding:
+            pv[i + 1] = pv[i]
+            if p > buy_threshold:
+                holding = True
+                entry_price = close[i]
+        else:
+            daily_return = (close[i + 1] - close[i]) / close[i]
+            pv[i + 1] = pv[i] * (1.0 + daily_return)
+            if p < sell_threshold:
+                trade_returns[num_trades] = (close[i + 1] - entry_price) / entry_price
+                num_trades += 1
+                holding = False
+
+    # Close any open position at the last bar
+    if holding:
+        trade_returns[num_trades] = (close[n - 1] - entry_price) / entry_price
+        num_trades += 1
+
+    return pv, trade_returns[:num_trades]
+
+
+@njit(cache=True, fastmath=True)
+def _max_drawdown(pv):
+    """Max drawdown in one fused pass (no peak/drawdown temporaries)."""
+    peak = pv[0]
+    mdd = 0.0
+    for v in pv:
+        if v > peak:
+            peak = v
+        dd = (v - peak) / peak
+        if dd < mdd:
+            mdd = dd
+    return -mdd
+
+
+# Warm the JIT compiles at import time on a tiny series so the first real
+# backtest does not pay the compilation latency (cache=True keeps the
+# compiled kernels across processes)
+_simulate(np.ones(4), np.full(4, 0.5), 0.6, 0.4)
+_max_drawdown(np.ones(4))
+
+
+def compute_prob_up(ohlcv_df: pd.DataFrame, model_or_payload,
+                    add_kd: bool = False) -> tuple:
+    """
+    Featurize and score OHLCV once, independent of thresholds.
+
+    Threshold sweeps should call this once and pass the arrays into
+    simulate_from_probas per (buy, sell) pair - model.predict_proba
+    dominates the cost of a backtest and does not depend on thresholds.
+
+    Returns:
+        (close_arr, prob_up_arr) as float64 ndarrays, or (None, error_msg)
+    """
+    model, feature_cols = _normalize_payload(model_or_payload, add_kd)
+
+    if model is None:
+        return None, 'No model provided'
+
+    feat_df = feature_engineering.create_features(ohlcv_df, include_target=False, add_kd=add_kd)
+
+    if feat_df.empty or len(feat_df) < 50:
+        return None, 'Failed to compute features'
+
+    # Align columns
+    missing_cols = set(feature_cols) - set(feat_df.columns)
+    for col in missing_cols:
+        feat_df[col] = 0
+
+    feat_df = feat_df[feature_cols].fillna(0)
+    close = ohlcv_df.loc[feat_df.index, 'Close']
+
+    try:
+        probas = model.predict_proba(feat_df)
+        if len(probas.shape) > 1 and probas.shape[1] > 1:
+            prob_up = probas[:, 1]
+        else:
+            prob_up = np.full(len(feat_df), 0.5)
+    except Exception as e:
+        return None, f'Prediction failed: {e}'
+
+    return (close.to_numpy(dtype=np.float64),
+            np.ascontiguousarray(prob_up, dtype=np.float64))
+
+
+def simulate_from_probas(close_arr: np.ndarray, prob_up: np.ndarray,
+                         buy_threshold: float = 0.60,
+                         sell_threshold: float = 0.40) -> dict:
+    """
+    Run the simulation and metrics given precomputed probabilities.
+
+    Args:
+        close_arr: Close prices (float64 ndarray)
+        prob_up: P(up) per bar (float64 ndarray)
+        buy_threshold: P(up) threshold to buy
+        sell_threshold: P(up) threshold to sell
+
+    Returns:
+        dict with total_return, win_rate, max_drawdown, num_trades
+    """
+    # TODO: Add fees/slippage in future versions
+
+    pv, trade_returns = _simulate(close_arr, prob_up,
+                                  buy_threshold, sell_threshold)
+
+    num_trades = len(trade_returns)
+    if num_trades:
+        total_return = float(trade_returns.sum())
+        win_rate = float((trade_returns > 0).sum()) / num_trades
+    else:
+        total_return = 0.0
+        win_rate = 0.0
+
+    # Max drawdown (pv is flat on non-holding days, so the running peak
+    # matches the loop version that only appended while holding)
+    max_drawdown = float(_max_drawdown(pv))
+
+    return {
+        'total_return': round(total_return * 100, 2),  # as percentage
+        'win_rate': round(win_rate * 100, 2),  # as percentage
+        'max_drawdown': round(max_drawdown * 100, 2),  # as percentage
+        'num_trades': num_trades,
+        'error': None
+    }
+
+
 def run_backtest(ohlcv_df: pd.DataFrame, model_or_payload,
                  buy_threshold: float = 0.60, sell_threshold: float = 0.40,
                  add_kd: bool = False) -> dict:
@@ -42,110 +209,13 @@ def run_backtest(ohlcv_df: pd.DataFrame, model_or_payload,
     if ohlcv_df is None or ohlcv_df.empty or len(ohlcv_df) < 50:
         result['error'] = 'Insufficient data'
         return result
-    
-    # Get model and feature cols from payload
-    if isinstance(model_or_payload, dict):
-        model = model_or_payload.get('model')
-        feature_cols = model_or_payload.get('feature_cols')
-    else:
-        model = model_or_payload
-        feature_cols = feature_engineering.get_feature_columns(add_kd)
-    
-    if model is None:
-        result['error'] = 'No model provided'
-        return result
-    
-    # Compute features
-    feat_df = feature_engineering.create_features(ohlcv_df, include_target=False, add_kd=add_kd)
-    
-    if feat_df.empty or len(feat_df) < 50:
-        result['error'] = 'Failed to compute features'
-        return result
-    
-    # Align columns
-    missing_cols = set(feature_cols) - set(feat_df.columns)
-    for col in missing_cols:
-        feat_df[col] = 0
-    
-    feat_df = feat_df[feature_cols].fillna(0)
-    close = ohlcv_df.loc[feat_df.index, 'Close']
-    
-    # Predict probabilities for all rows
-    try:
-        probas = model.predict_proba(feat_df)
-        if len(probas.shape) > 1 and probas.shape[1] > 1:
-            prob_up = probas[:, 1]
-        else:
-            prob_up = np.full(len(feat_df), 0.5)
-    except Exception as e:
-        result['error'] = f'Prediction failed: {e}'
+
+    # Featurize + score once (threshold-independent)
+    close_arr, prob_up = compute_prob_up(ohlcv_df, model_or_payload, add_kd=add_kd)
+
+    if close_arr is None:
+        result['error'] = prob_up  # error message
         return result
-    
-    # --- Backtest simulation ---
-    holding = False
-    entry_price = 0.0
-    trades = []
-    portfolio_values = [1.0]  # Start with 1.0
-    
-    # TODO: Add fees/slippage in future versions
-    
-    for i in range(len(prob_up) - 1):
-        current_price = close.iloc[i]
-        next_price = close.iloc[i + 1]
-        p = prob_up[i]
-        
-        if not holding:
-            # Check buy signal
-            if p > buy_threshold:
-                holding = True
-                entry_price = current_price
-        else:
-            # Check sell signal
-            daily_return = (next_price - current_price) / current_price
-            portfolio_values.append(portfolio_values[-1] * (1 + daily_return))
-            
-            if p < sell_threshold:
-                # Sell
-                exit_price = next_price
-                trade_return = (exit_price - entry_price) / entry_price
-                trades.append({
-                    'entry': entry_price,
-                    'exit': exit_price,
-                    'return': trade_return
-                })
-                holding = False
-    
-    # Close any open position at end
-    if holding and len(close) > 0:
-        exit_price = close.iloc[-1]
-        trade_return = (exit_price - entry_price) / entry_price
-        trades.append({
-            'entry': entry_price,
-            'exit': exit_price,
-            'return': trade_return
-        })
-    
-    # Calculate metrics
-    if trades:
-        total_return = sum(t['return'] for t in trades)
-        wins = sum(1 for t in trades if t['return'] > 0)
-        win_rate = wins / len(trades)
-    else:
-        total_return = 0.0
-        win_rate = 0.0
-    
-    # Max drawdown
-    if len(portfolio_values) > 1:
-        pv = np.array(portfolio_values)
-        peaks = np.maximum.accumulate(pv)
-        drawdowns = (pv - peaks) / peaks
-        max_drawdown = abs(drawdowns.min())
-    else:
-        max_drawdown = 0.0
-    
-    result['total_return'] = round(total_return * 100, 2)  # as percentage
-    result['win_rate'] = round(win_rate * 100, 2)  # as percentage
-    result['max_drawdown'] = round(max_drawdown * 100, 2)  # as percentage
-    result['num_trades'] = len(trades)
-    
-    return result
+
+    return simulate_from_probas(close_arr, prob_up,
+                                buy_threshold, sell_threshold)
@@ -12,7 +12,26 @@ import pandas as pd
 import json
 import os
 import re
+import time
+import requests
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- Shared HTTP Session ---
+# One pooled session for all yfinance calls: keep-alive avoids a fresh
+# TLS handshake per ticker during scans. Retries back off on the
+# throttling/outage statuses Yahoo actually returns instead of failing
+# the ticker outright.
+SESSION = requests.Session()
+_retry = Retry(total=3, backoff_factor=0.3,
+               status_forcelist=[429, 500, 502, 503, 504])
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_retry)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
 
 # --- Paths ---
 DATA_DIR = Path("data")
@@ -20,20 +39,36 @@ OHLCV_DIR = DATA_DIR / "ohlcv"
 UNIVERSE_PATH = DATA_DIR / "universe.parquet"
 STOCK_MAP_FILE = "tw_stocks.json"
 
+# Disk-cache TTL: cached OHLCV survives process restarts, but files older
+# than a day fall through to a refetch so data stays current
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
 # --- Stock Map (Name -> Code) ---
+# Parsed lazily on first lookup: ~10k Chinese keys cost a full JSON
+# parse, which processes that never resolve a name should not pay at
+# import time
 stock_map = {}
+# Derived lookups, rebuilt alongside stock_map: reverse code -> name for
+# O(1) name resolution, and the digit-code entries pre-filtered so the
+# partial-match scan skips the per-item isdigit() check
+code_to_name = {}
+_digit_items = []
+_stock_map_loaded = False
 
-def load_stock_map():
-    """Load stock name to code mapping from JSON."""
-    global stock_map
+def load_stock_map(force=False):
+    """Load stock name to code mapping from JSON (once, on first use)."""
+    global stock_map, code_to_name, _digit_items, _stock_map_loaded
+    if _stock_map_loaded and not force:
+        return
     if os.path.exists(STOCK_MAP_FILE):
         try:
             with open(STOCK_MAP_FILE, 'r', encoding='utf-8') as f:
                 stock_map = json.load(f)
         except Exception as e:
             print(f"Error loading stock map: {e}")
-
-load_stock_map()
+    code_to_name = {str(c): n for n, c in stock_map.items()}
+    _digit_items = [(n, c) for n, c in stock_map.items() if str(c).isdigit()]
+    _stock_map_loaded = True
 
 
 # --- A) Universe Builder ---
@@ -46,28 +81,27 @@ def build_universe(json_path=STOCK_MAP_FILE, out_path=UNIVERSE_PATH):
         pd.DataFrame with schema: code, name_zh, ticker, market, is_etf, is_active
     """
     DATA_DIR.mkdir(exist_ok=True)
-    
+
     # Load JSON
     with open(json_path, 'r', encoding='utf-8') as f:
         raw_map = json.load(f)
-    
-    # Filter for 4-digit codes only
-    pattern = re.compile(r'^\d{4}$')
-    records = []
-    
-    for name_zh, code in raw_map.items():
-        if pattern.match(str(code)):
-            records.append({
-                "code": str(code),
-                "name_zh": name_zh,
-                "ticker": f"{code}.TW",
-                "market": "AUTO",
-                "is_etf": str(code).startswith("00"),
-                "is_active": True
-            })
-    
-    df = pd.DataFrame(records)
-    df.to_parquet(out_path, index=False)
+
+    # Filter for 4-digit codes only - one vectorized pass instead of a
+    # Python loop building dicts per entry
+    codes = pd.Series(raw_map, name='code').astype(str)
+    codes = codes[codes.str.fullmatch(r'\d{4}')]
+
+    df = pd.DataFrame({
+        "code": codes.values,
+        "name_zh": codes.index.values,
+        "ticker": codes.values + ".TW",
+        # Categorical for the single-valued column -> parquet dictionary
+        # encoding instead of repeating the string per row
+        "market": pd.Categorical(["AUTO"] * len(codes)),
+        "is_etf": codes.str.startswith("00").values,
+        "is_active": True
+    })
+    df.to_parquet(out_path, index=False, compression='zstd')
     print(f"[Universe] Built {len(df)} stocks -> {out_path}")
     return df
 
@@ -80,6 +114,25 @@ def load_universe(path=UNIVERSE_PATH):
 
 
 # --- B) OHLCV Disk Caching ---
+def _write_ohlcv_cache(df, path):
+    """
+    Write OHLCV cache as float32 prices + ZSTD parquet.
+
+    float32 halves the price-column footprint (TWD magnitudes keep well
+    over 2 decimal places of precision) and ZSTD compresses better than
+    the parquet default. Volume stays integer.
+    """
+    try:
+        out = df.astype({c: 'float32' for c in ('Open', 'High', 'Low', 'Close')
+                         if c in df.columns})
+        # Write through pyarrow directly - skips the pandas parquet
+        # adapter layer on top of the same engine
+        table = pa.Table.from_pandas(out, preserve_index=True)
+        pq.write_table(table, path, compression='zstd')
+    except Exception as e:
+        print(f"[Cache] Error writing {path}: {e}")
+
+
 def get_cache_paths(ticker):
     """
     Get cache file paths for a ticker.
@@ -117,19 +170,22 @@ def fetch_stock_history(ticker, start=None, end=None, period="6mo",
     
     cache_path = get_cache_paths(ticker)["ohlcv"]
     
-    # Try cache first
+    # Try cache first (only if still fresh)
     if use_cache and not force_refresh and cache_path.exists():
         try:
-            df = pd.read_parquet(cache_path)
-            df.index = pd.to_datetime(df.index)
-            df = df.sort_index()
-            return df, None  # No stock_obj from cache
+            if time.time() - cache_path.stat().st_mtime <= CACHE_TTL_SECONDS:
+                # Direct pyarrow read; self_destruct releases the Arrow
+                # buffers during conversion instead of holding both copies
+                df = pq.read_table(cache_path).to_pandas(self_destruct=True)
+                df.index = pd.to_datetime(df.index)
+                df = df.sort_index()
+                return df, None  # No stock_obj from cache
         except Exception as e:
             print(f"[Cache] Error reading {cache_path}: {e}")
     
     # Fetch from yfinance
     try:
-        stock = yf.Ticker(ticker)
+        stock = yf.Ticker(ticker, session=SESSION)
         
         if start:
             df = stock.history(start=start, end=end)
@@ -140,7 +196,7 @@ def fetch_stock_history(ticker, start=None, end=None, period="6mo",
             # Try .TWO suffix for OTC stocks
             if ticker.endswith(".TW"):
                 ticker_otc = ticker.replace(".TW", ".TWO")
-                stock = yf.Ticker(ticker_otc)
+                stock = yf.Ticker(ticker_otc, session=SESSION)
                 if start:
                     df = stock.history(start=start, end=end)
                 else:
@@ -156,7 +212,7 @@ def fetch_stock_history(ticker, start=None, end=None, period="6mo",
         
         # Save to cache
         if use_cache and not df.empty:
-            df.to_parquet(cache_path)
+            _write_ohlcv_cache(df, cache_path)
         
         return df, stock
         
@@ -165,7 +221,81 @@ def fetch_stock_history(ticker, start=None, end=None, period="6mo",
         return pd.DataFrame(), None
 
 
-def build_ohlcv_dataset(universe_path=UNIVERSE_PATH, start="2018-01-01", 
+def fetch_stock_history_batch(tickers, period="6mo", start=None, end=None,
+                              use_cache=True):
+    """
+    Fetch OHLCV for multiple tickers in a single yfinance download.
+
+    One multi-ticker request replaces N per-ticker round trips, so a
+    sector scan issues one HTTP call instead of one per stock.
+
+    Args:
+        tickers: Iterable of tickers (e.g., ["2330.TW", "2317.TW"])
+        period: yfinance period string (default "6mo")
+        start: Start date (optional, overrides period)
+        end: End date (optional)
+        use_cache: Whether to write results to the disk cache
+
+    Returns:
+        dict mapping ticker -> OHLCV DataFrame (empty DataFrame on failure)
+    """
+    tickers = [validate_ticker(t) for t in tickers]
+    OHLCV_DIR.mkdir(parents=True, exist_ok=True)
+
+    data = None
+    try:
+        if start:
+            data = yf.download(" ".join(tickers), start=start, end=end,
+                               group_by='ticker', threads=True, progress=False,
+                               session=SESSION)
+        else:
+            data = yf.download(" ".join(tickers), period=period,
+                               group_by='ticker', threads=True, progress=False,
+                               session=SESSION)
+    except Exception as e:
+        print(f"[Batch] Error downloading: {e}")
+
+    required_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
+    result = {}
+
+    for ticker in tickers:
+        df = pd.DataFrame()
+
+        if data is not None and not data.empty:
+            try:
+                if isinstance(data.columns, pd.MultiIndex):
+                    df = data[ticker].dropna(how='all')
+                else:
+                    # Single-ticker download returns flat columns
+                    df = data.dropna(how='all')
+            except KeyError:
+                df = pd.DataFrame()
+
+        if df.empty:
+            # Fall back to per-ticker fetch (handles .TWO retry + cache read)
+            df, _ = fetch_stock_history(ticker, start=start, end=end,
+                                        period=period, use_cache=use_cache)
+            result[ticker] = df
+            continue
+
+        # Standardize columns
+        df = df.copy()
+        for col in required_cols:
+            if col not in df.columns:
+                df[col] = 0
+
+        df = df[required_cols].sort_index()
+
+        # Save to cache
+        if use_cache and not df.empty:
+            _write_ohlcv_cache(df, get_cache_paths(ticker)["ohlcv"])
+
+        result[ticker] = df
+
+    return result
+
+
+def build_ohlcv_dataset(universe_path=UNIVERSE_PATH, start="2018-01-01",
                         end=None, max_tickers=None, force_refresh=False):
     """
     Batch download and cache OHLCV for universe.
@@ -189,32 +319,55 @@ def build_ohlcv_dataset(universe_path=UNIVERSE_PATH, start="2018-01-01",
     tickers = universe['ticker'].tolist()
     if max_tickers:
         tickers = tickers[:max_tickers]
-    
+
     results = {"success": 0, "failed": 0, "skipped": 0}
-    
-    for i, ticker in enumerate(tickers):
-        cache_path = get_cache_paths(ticker)["ohlcv"]
-        
-        # Skip if cached and not forcing refresh
-        if cache_path.exists() and not force_refresh:
+
+    # Skip already-cached tickers up front (resumable): one directory
+    # scan instead of a stat syscall per ticker
+    OHLCV_DIR.mkdir(parents=True, exist_ok=True)
+    cached_files = {entry.name for entry in os.scandir(OHLCV_DIR)}
+
+    pending = []
+    for ticker in tickers:
+        cache_name = get_cache_paths(ticker)["ohlcv"].name
+        if cache_name in cached_files and not force_refresh:
             results["skipped"] += 1
-            continue
-        
-        try:
-            df, _ = fetch_stock_history(ticker, start=start, end=end, 
-                                        use_cache=True, force_refresh=force_refresh)
-            if not df.empty:
-                results["success"] += 1
-            else:
-                results["failed"] += 1
-        except Exception as e:
-            print(f"[OHLCV] Failed {ticker}: {e}")
-            results["failed"] += 1
-        
-        # Progress
-        if (i + 1) % 50 == 0:
-            print(f"[OHLCV] Progress: {i+1}/{len(tickers)}")
-    
+        else:
+            pending.append(ticker)
+
+    # Batch the downloads through Yahoo's multi-symbol endpoint: one
+    # request covers ~50 tickers, and a few batches run concurrently so
+    # wall time is bounded by batch round-trips, not per-ticker ones
+    BATCH_SIZE = 50
+    chunks = [pending[i:i + BATCH_SIZE]
+              for i in range(0, len(pending), BATCH_SIZE)]
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {
+            executor.submit(fetch_stock_history_batch, chunk,
+                            start=start, end=end, use_cache=True): chunk
+            for chunk in chunks
+        }
+
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                batch = future.result()
+                for ticker in chunk:
+                    df = batch.get(ticker)
+                    if df is not None and not df.empty:
+                        results["success"] += 1
+                    else:
+                        results["failed"] += 1
+            except Exception as e:
+                print(f"[OHLCV] Failed batch {chunk[0]}..{chunk[-1]}: {e}")
+                results["failed"] += len(chunk)
+
+            # Progress
+            done += len(chunk)
+            print(f"[OHLCV] Progress: {done}/{len(pending)}")
+
     print(f"[OHLCV] Done: {results}")
     return results
 
@@ -237,41 +390,40 @@ def validate_ticker(ticker):
 def search_stock_by_name(query):
     """Search for ticker by Chinese name or code."""
     query = query.strip()
-    
+
     if query.isdigit():
         return f"{query}.TW"
-    
+
+    load_stock_map()
     if query in stock_map:
         return f"{stock_map[query]}.TW"
     
     # Partial match
-    for name, code in stock_map.items():
-        if query in name and str(code).isdigit():
+    for name, code in _digit_items:
+        if query in name:
             return f"{code}.TW"
-    
+
     return query
 
 
 def get_stock_name(ticker):
     """Get Chinese name for a ticker."""
+    load_stock_map()
     code = ticker.replace(".TW", "").replace(".TWO", "")
-    for name, c in stock_map.items():
-        if str(c) == code:
-            return name
-    return ticker
+    return code_to_name.get(code, ticker)
 
 
 def fetch_stock_info(ticker):
     """Fetch basic stock info from yfinance."""
     ticker = validate_ticker(ticker)
     try:
-        stock = yf.Ticker(ticker)
+        stock = yf.Ticker(ticker, session=SESSION)
         info = stock.info
         
         # Try .TWO if .TW fails
         if (not info or info.get('regularMarketPrice') is None) and ticker.endswith(".TW"):
             ticker_otc = ticker.replace(".TW", ".TWO")
-            stock = yf.Ticker(ticker_otc)
+            stock = yf.Ticker(ticker_otc, session=SESSION)
             info = stock.info
         
         return info
@@ -7,17 +7,158 @@ No leakage: all features use <= t data only.
 
 import pandas as pd
 import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def _rolling_features(close, high, low):
+    """
+    Fused single-pass kernel for the price-derived feature columns.
+
+    One walk over the arrays maintains the EMA states and ring sums for
+    every rolling feature at once, instead of six separate pandas passes
+    each re-reading the series. NaN placement follows the pandas
+    min_periods semantics of the original per-feature implementations.
+    """
+    n = close.shape[0]
+    rsi = np.full(n, np.nan)
+    macd = np.empty(n)
+    macd_signal = np.empty(n)
+    macd_hist = np.empty(n)
+    ret_1d = np.full(n, np.nan)
+    ret_5d = np.full(n, np.nan)
+    vol_20d = np.full(n, np.nan)
+    bias_20 = np.full(n, np.nan)
+    hl_range = np.full(n, np.nan)
+
+    # EMA states (ewm adjust=False), span 12/26/9
+    a_fast = 2.0 / 13.0
+    a_slow = 2.0 / 27.0
+    a_sig = 2.0 / 10.0
+    ema_fast = close[0]
+    ema_slow = close[0]
+    sig = 0.0
+    macd[0] = 0.0
+    macd_signal[0] = 0.0
+    macd_hist[0] = 0.0
+
+    # Ring sums: RSI gains/losses (14), MA20 closes, ret_1d mean/var (20)
+    gain_sum = 0.0
+    loss_sum = 0.0
+    close_sum = 0.0
+    ret_sum = 0.0
+    ret_sumsq = 0.0
+
+    for i in range(n):
+        c = close[i]
+
+        if c != 0.0:
+            hl_range[i] = (high[i] - low[i]) / c
+
+        if i > 0:
+            # MACD(12, 26, 9)
+            ema_fast = a_fast * c + (1.0 - a_fast) * ema_fast
+            ema_slow = a_slow * c + (1.0 - a_slow) * ema_slow
+            m = ema_fast - ema_slow
+            sig = a_sig * m + (1.0 - a_sig) * sig
+            macd[i] = m
+            macd_signal[i] = sig
+            macd_hist[i] = m - sig
+
+            # RSI(14): sliding sums of gains and losses
+            d = c - close[i - 1]
+            gain_sum += d if d > 0.0 else 0.0
+            loss_sum += -d if d < 0.0 else 0.0
+            if i > 14:
+                d_old = close[i - 14] - close[i - 15]
+                gain_sum -= d_old if d_old > 0.0 else 0.0
+                loss_sum -= -d_old if d_old < 0.0 else 0.0
+            # First valid at i=13: the masked diff series starts with an
+            # explicit 0.0 at index 0, so the 14-wide window fills early
+            if i >= 13 and loss_sum != 0.0:
+                rs = gain_sum / loss_sum
+                rsi[i] = 100.0 - 100.0 / (1.0 + rs)
+
+            # Returns + 20-day volatility (sample std of ret_1d)
+            r = c / close[i - 1] - 1.0
+            ret_1d[i] = r
+            ret_sum += r
+            ret_sumsq += r * r
+            if i > 20:
+                r_old = close[i - 20] / close[i - 21] - 1.0
+                ret_sum -= r_old
+                ret_sumsq -= r_old * r_old
+            if i >= 20:
+                mean = ret_sum / 20.0
+                var = (ret_sumsq - 20.0 * mean * mean) / 19.0
+                vol_20d[i] = np.sqrt(var) if var > 0.0 else 0.0
+
+        if i >= 5:
+            ret_5d[i] = c / close[i - 5] - 1.0
+
+        # MA20 bias
+        close_sum += c
+        if i >= 20:
+            close_sum -= close[i - 20]
+        if i >= 19:
+            ma = close_sum / 20.0
+            if ma != 0.0:
+                bias_20[i] = (c - ma) / ma
+
+    return (rsi, macd, macd_signal, macd_hist, ret_1d, ret_5d,
+            vol_20d, bias_20, hl_range)
+
+
+@njit(cache=True)
+def _stoch_kd(high, low, close, k_period, d_period):
+    """Stochastic %K/%D in one compiled pass (optional feature)."""
+    n = close.shape[0]
+    k = np.full(n, np.nan)
+    d = np.full(n, np.nan)
+
+    for i in range(k_period - 1, n):
+        hh = high[i]
+        ll = low[i]
+        for j in range(i - k_period + 1, i):
+            if high[j] > hh:
+                hh = high[j]
+            if low[j] < ll:
+                ll = low[j]
+        denom = hh - ll
+        if denom != 0.0:
+            k[i] = 100.0 * (close[i] - ll) / denom
+
+    for i in range(d_period - 1, n):
+        acc = 0.0
+        ok = True
+        for j in range(i - d_period + 1, i + 1):
+            if np.isnan(k[j]):
+                ok = False
+                break
+            acc += k[j]
+        if ok:
+            d[i] = acc / d_period
+
+    return k, d
+
+
+# Warm the JIT compiles at import so the first per-ticker feature build
+# does not pay compilation latency
+_rolling_features(np.ones(2), np.ones(2), np.ones(2))
+_stoch_kd(np.ones(2), np.ones(2), np.ones(2), 9, 3)
 
 
 def compute_rsi(close: pd.Series, period: int = 14) -> pd.Series:
-    """Compute RSI indicator."""
-    delta = close.diff()
-    gain = delta.where(delta > 0, 0.0)
-    loss = -delta.where(delta < 0, 0.0)
-    
+    """Compute RSI indicator (SMA smoothing, matching the trained model)."""
+    delta = close.diff().to_numpy()
+
+    # Single-pass masks on the raw array instead of two Series.where calls
+    gain = pd.Series(np.where(delta > 0, delta, 0.0), index=close.index)
+    loss = pd.Series(np.where(delta < 0, -delta, 0.0), index=close.index)
+
     avg_gain = gain.rolling(window=period, min_periods=period).mean()
     avg_loss = loss.rolling(window=period, min_periods=period).mean()
-    
+
     rs = avg_gain / avg_loss.replace(0, np.nan)
     rsi = 100 - (100 / (1 + rs))
     return rsi
@@ -65,67 +206,60 @@ def create_features(ohlcv_df: pd.DataFrame, include_target: bool = True,
     if ohlcv_df is None or ohlcv_df.empty:
         return pd.DataFrame()
     
-    df = ohlcv_df.copy()
-    
-    # Ensure required columns exist
+    # Ensure required columns exist (input is read-only, no copy needed)
     required = ['Open', 'High', 'Low', 'Close', 'Volume']
     for col in required:
-        if col not in df.columns:
+        if col not in ohlcv_df.columns:
             return pd.DataFrame()
-    
-    features = pd.DataFrame(index=df.index)
-    
-    close = df['Close']
-    high = df['High']
-    low = df['Low']
-    volume = df['Volume']
-    
-    # --- RSI(14) ---
-    features['rsi_14'] = compute_rsi(close, 14)
-    
-    # --- MACD(12,26,9) ---
-    macd, macd_signal, macd_hist = compute_macd(close, 12, 26, 9)
-    features['macd'] = macd
-    features['macd_signal'] = macd_signal
-    features['macd_hist'] = macd_hist
-    
-    # --- Returns ---
-    features['ret_1d'] = close.pct_change(1)
-    features['ret_5d'] = close.pct_change(5)
-    
-    # --- Volatility (20-day rolling std of daily returns) ---
-    features['volatility_20d'] = features['ret_1d'].rolling(window=20, min_periods=20).std()
-    
-    # --- Bias: (Close - MA20) / MA20 ---
-    ma_20 = close.rolling(window=20, min_periods=20).mean()
-    features['bias_20'] = (close - ma_20) / ma_20.replace(0, np.nan)
-    
-    # --- H-L Range ---
-    features['hl_range'] = (high - low) / close.replace(0, np.nan)
-    
+
+    close = ohlcv_df['Close'].to_numpy(dtype=np.float64)
+    high = ohlcv_df['High'].to_numpy(dtype=np.float64)
+    low = ohlcv_df['Low'].to_numpy(dtype=np.float64)
+    volume = ohlcv_df['Volume'].to_numpy(dtype=np.float64)
+
+    # All rolling/EMA features in one fused pass
+    (rsi, macd, macd_signal, macd_hist, ret_1d, ret_5d,
+     vol_20d, bias_20, hl_range) = _rolling_features(close, high, low)
+
+    cols = {
+        'rsi_14': rsi,
+        'macd': macd,
+        'macd_signal': macd_signal,
+        'macd_hist': macd_hist,
+        'ret_1d': ret_1d,
+        'ret_5d': ret_5d,
+        'volatility_20d': vol_20d,
+        'bias_20': bias_20,
+        'hl_range': hl_range,
+    }
+
     # --- Lag features ---
+    # Pad with min(k, n) NaNs so frames shorter than the lag still get a
+    # full-length (all-NaN) column, matching Series.shift semantics
+    n = len(close)
     for k in range(1, lags + 1):
-        features[f'close_lag{k}'] = close.shift(k)
-        features[f'volume_lag{k}'] = volume.shift(k)
-        features[f'ret_1d_lag{k}'] = features['ret_1d'].shift(k)
-    
+        nan_pad = np.full(min(k, n), np.nan)
+        keep = max(n - k, 0)
+        cols[f'close_lag{k}'] = np.concatenate((nan_pad, close[:keep]))
+        cols[f'volume_lag{k}'] = np.concatenate((nan_pad, volume[:keep]))
+        cols[f'ret_1d_lag{k}'] = np.concatenate((nan_pad, ret_1d[:keep]))
+
     # --- Optional: Stochastic KD ---
     if add_kd:
-        k, d = compute_stochastic_kd(high, low, close, 9, 3)
-        features['stoch_k'] = k
-        features['stoch_d'] = d
-    
+        k, d = _stoch_kd(high, low, close, 9, 3)
+        cols['stoch_k'] = k
+        cols['stoch_d'] = d
+
     # --- Target: 1 if next day close > today close, else 0 ---
     if include_target:
-        next_close = close.shift(-1)
-        features['target'] = (next_close > close).astype(float)
-        # Last row target must be NaN (no future data)
-        features.loc[features.index[-1], 'target'] = np.nan
-    
-    # Keep only numeric columns
-    features = features.select_dtypes(include=[np.number])
-    
-    return features
+        target = np.full(len(close), np.nan)
+        # Last row target stays NaN (no future data)
+        target[:-1] = (close[1:] > close[:-1]).astype(np.float64)
+        cols['target'] = target
+
+    # Assemble all columns at once (no per-column insertion); every
+    # column is already a float64 array, so no numeric filtering needed
+    return pd.DataFrame(cols, index=ohlcv_df.index)
 
 
 def get_feature_columns(add_kd: bool = False) -> list:
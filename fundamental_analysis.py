@@ -1,30 +1,42 @@
 import pandas as pd
 
+# Static field table: (output label, yfinance info key, format kind).
+# Built once at import instead of rebuilding the mapping per call.
+_FIELDS = (
+    ("Name", "longName", "raw"),
+    ("Symbol", "symbol", "raw"),
+    ("Sector", "sector", "raw"),
+    ("Industry", "industry", "raw"),
+    ("Market Cap", "marketCap", "raw"),
+    ("P/E Ratio", "trailingPE", "raw"),
+    ("Forward P/E", "forwardPE", "raw"),
+    ("Dividend Yield", "dividendYield", "pct"),
+    ("Ex-Dividend Date", "exDividendDate", "raw"),
+    ("Trailing EPS", "trailingEps", "raw"),
+    ("Forward EPS", "forwardEps", "raw"),
+    ("ROE", "returnOnEquity", "pct"),
+    ("Profit Margin", "profitMargins", "pct"),
+    ("Price to Book", "priceToBook", "raw"),
+)
+
+
+def _fmt(val, kind):
+    if kind == "pct" and isinstance(val, (int, float)):
+        return f"{val * 100:.2f}%"
+    return val
+
+
 def get_fundamental_metrics(info):
     """
     Extracts key fundamental metrics from yfinance info dict.
     """
-    metrics = {
-        "Name": info.get("longName", "N/A"),
-        "Symbol": info.get("symbol", "N/A"),
-        "Sector": info.get("sector", "N/A"),
-        "Industry": info.get("industry", "N/A"),
-        "Market Cap": info.get("marketCap", "N/A"),
-        "P/E Ratio": info.get("trailingPE", "N/A"),
-        "Forward P/E": info.get("forwardPE", "N/A"),
-        "Dividend Yield": info.get("dividendYield", info.get("trailingAnnualDividendYield", "N/A")),
-        "Ex-Dividend Date": info.get("exDividendDate", "N/A"),
-        "Trailing EPS": info.get("trailingEps", "N/A"),
-        "Forward EPS": info.get("forwardEps", "N/A"),
-        "ROE": info.get("returnOnEquity", "N/A"),
-        "Profit Margin": info.get("profitMargins", "N/A"),
-        "Price to Book": info.get("priceToBook", "N/A"),
-    }
-    
-    # Format percentages
-    for key in ["Dividend Yield", "ROE", "Profit Margin"]:
-        val = metrics[key]
-        if isinstance(val, (int, float)):
-            metrics[key] = f"{val * 100:.2f}%"
-            
+    metrics = {label: _fmt(info.get(key, "N/A"), kind)
+               for label, key, kind in _FIELDS}
+
+    # Dividend yield falls back to the trailing annual figure when the
+    # forward one is missing
+    if metrics["Dividend Yield"] == "N/A":
+        metrics["Dividend Yield"] = _fmt(
+            info.get("trailingAnnualDividendYield", "N/A"), "pct")
+
     return metrics
@@ -7,14 +7,15 @@ Supports pooled training from multiple tickers.
 
 import pandas as pd
 import numpy as np
-import joblib
 from pathlib import Path
 from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, roc_auc_score
 
 import feature_engineering
 
+# sklearn and joblib are imported inside the functions that need them:
+# pulling scipy at module import inflated every app cold start even in
+# sessions that never train or load a model (first call pays it instead)
+
 
 def time_series_train_test_split(feature_df: pd.DataFrame, test_size: float = 0.2,
                                   target_col: str = "target") -> tuple:
@@ -29,10 +30,12 @@ def time_series_train_test_split(feature_df: pd.DataFrame, test_size: float = 0.
     Returns:
         X_train, X_test, y_train, y_test
     """
-    # Drop rows with NaN target
-    df = feature_df.dropna(subset=[target_col]).copy()
-    df = df.sort_index()
-    
+    # Drop rows with NaN target - positional mask, no full-frame copy
+    mask = feature_df[target_col].notna().to_numpy()
+    df = feature_df.iloc[np.flatnonzero(mask)]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+
     # Split point
     n = len(df)
     split_idx = int(n * (1 - test_size))
@@ -84,10 +87,10 @@ def get_rf_params(n_rows: int) -> dict:
 
 
 def train_random_forest(data, target_col: str = "target", test_size: float = 0.2,
-                         add_kd: bool = False) -> dict:
+                         add_kd: bool = False, model_type: str = "rf") -> dict:
     """
-    Train RandomForest classifier.
-    
+    Train RandomForest (default) or HistGradientBoosting classifier.
+
     Args:
         data: One of:
             - Single DataFrame with features + target
@@ -96,10 +99,18 @@ def train_random_forest(data, target_col: str = "target", test_size: float = 0.2
         target_col: Name of target column
         test_size: Test set fraction
         add_kd: Whether to include KD features
-        
+        model_type: "rf" (default) or "hgb" - hgb bins features once and
+            trains histogram-based trees, much faster on pooled datasets;
+            small datasets (<1000 rows) fall back to the conservative RF
+
     Returns:
-        dict with 'model', 'metrics', 'feature_cols', 'train_rows', 'test_rows'
+        dict with 'model', 'metrics', 'feature_cols', 'train_rows',
+        'test_rows', 'model_kind' ('rf' or 'hgb' - which estimator was
+        actually trained, accounting for the small-dataset RF fallback)
     """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, roc_auc_score
+
     # Handle different input types
     if isinstance(data, list):
         # List of DataFrames - check if they are OHLCV or feature DFs
@@ -121,9 +132,12 @@ def train_random_forest(data, target_col: str = "target", test_size: float = 0.2
         if not dfs:
             return {'model': None, 'metrics': {}, 'feature_cols': [], 'error': 'No valid data'}
         
-        # Concatenate and sort by date
+        # Concatenate and sort by date (copy-on-write already defers the
+        # concat copy; skip the sort when the pool is a single ticker
+        # already in order)
         combined_df = pd.concat(dfs, ignore_index=False)
-        combined_df = combined_df.sort_index()
+        if not combined_df.index.is_monotonic_increasing:
+            combined_df = combined_df.sort_index()
     else:
         # Single DataFrame
         if 'Close' in data.columns and target_col not in data.columns:
@@ -145,12 +159,31 @@ def train_random_forest(data, target_col: str = "target", test_size: float = 0.2
     X_train, X_test, y_train, y_test = time_series_train_test_split(
         combined_df, test_size=test_size, target_col=target_col
     )
-    
-    # Get dynamic params based on training size
-    rf_params = get_rf_params(len(X_train))
-    
+
+    # float32 is the dtype sklearn's trees use internally - casting here
+    # (column names kept) halves the matrix footprint and skips the
+    # conversion copy inside fit/predict
+    X_train = X_train.astype(np.float32)
+    X_test = X_test.astype(np.float32)
+
     # Train
-    model = RandomForestClassifier(**rf_params)
+    if model_type == "hgb" and len(X_train) >= 1000:
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        rf_params = {
+            'max_iter': 200,
+            'max_leaf_nodes': 31,
+            'learning_rate': 0.05,
+            'early_stopping': True,
+            'validation_fraction': 0.1,
+            'random_state': 42
+        }
+        model = HistGradientBoostingClassifier(**rf_params)
+        model_kind = 'hgb'
+    else:
+        # Dynamic params based on training size
+        rf_params = get_rf_params(len(X_train))
+        model = RandomForestClassifier(**rf_params)
+        model_kind = 'rf'
     model.fit(X_train, y_train)
     
     # Evaluate
@@ -179,24 +212,29 @@ def train_random_forest(data, target_col: str = "target", test_size: float = 0.2
         'feature_cols': feature_cols,
         'train_rows': len(X_train),
         'test_rows': len(X_test),
-        'rf_params': rf_params
+        'rf_params': rf_params,
+        'model_kind': model_kind
     }
 
 
-def save_model(model, model_path: str, feature_cols: list, metadata: dict = None):
+def save_model(model, model_path: str, feature_cols: list, metadata: dict = None,
+               model_type: str = 'sklearn_rf'):
     """
     Save model with payload for future loading.
-    
+
     Args:
         model: Trained sklearn model
         model_path: Path to save
         feature_cols: List of feature column names
         metadata: Optional metadata dict
+        model_type: Payload type tag (default 'sklearn_rf')
     """
+    import joblib
+
     Path(model_path).parent.mkdir(parents=True, exist_ok=True)
-    
+
     payload = {
-        'model_type': 'sklearn_rf',
+        'model_type': model_type,
         'model': model,
         'feature_cols': feature_cols,
         'metadata': metadata or {
@@ -205,15 +243,20 @@ def save_model(model, model_path: str, feature_cols: list, metadata: dict = None
         }
     }
     
-    joblib.dump(payload, model_path)
+    # Uncompressed (joblib default) + pickle protocol 5: the RF payload
+    # is mostly numpy tree arrays, which protocol 5 serializes as
+    # out-of-band buffers; joblib.load auto-detects the protocol
+    joblib.dump(payload, model_path, protocol=5)
     print(f"[Model] Saved to {model_path}")
 
 
 def load_model_payload(model_path: str) -> dict:
     """Load model payload from disk."""
+    import joblib
+
     if not Path(model_path).exists():
         return None
-    
+
     try:
         payload = joblib.load(model_path)
         return payload
@@ -255,27 +298,26 @@ def predict_proba_latest(model_or_payload, ohlcv_df: pd.DataFrame,
         
         if model is None or cols is None:
             return 0.5
-        
+
+        # Only the last row's features are needed - an 80-bar tail covers
+        # the longest warmup (EMA-26 MACD, MA20, RSI-14, 3 lags) with
+        # negligible EMA truncation error, so skip the full history
+        if len(ohlcv_df) > 80:
+            ohlcv_df = ohlcv_df.tail(80)
+
         # Compute features (no target needed)
         feat_df = feature_engineering.create_features(ohlcv_df, include_target=False, add_kd=add_kd)
         
         if feat_df.empty:
             return 0.5
         
-        # Get latest row
-        latest = feat_df.iloc[[-1]]
-        
-        # Align columns
-        missing_cols = set(cols) - set(latest.columns)
-        for col in missing_cols:
-            latest[col] = 0
-        
-        latest = latest[cols]
-        
-        # Handle NaN
-        if latest.isnull().any().any():
-            latest = latest.fillna(0)
-        
+        # Get latest row, aligned to the model's columns in one reindex
+        # (missing columns filled with 0, same as the old per-column
+        # loop) with one unconditional fillna. The frame keeps its
+        # column names so sklearn's feature-name check stays silent.
+        latest = feat_df.iloc[[-1]].reindex(columns=list(cols),
+                                            fill_value=0.0).fillna(0.0)
+
         # Predict
         proba = model.predict_proba(latest)
         
@@ -290,22 +332,25 @@ def predict_proba_latest(model_or_payload, ohlcv_df: pd.DataFrame,
         return 0.5
 
 
-def fit_from_pooled(ohlcv_list: list, model_out_path: str, 
-                    test_size: float = 0.2, add_kd: bool = False) -> dict:
+def fit_from_pooled(ohlcv_list: list, model_out_path: str,
+                    test_size: float = 0.2, add_kd: bool = False,
+                    model_type: str = "rf") -> dict:
     """
     Train model from pooled OHLCV data and save.
-    
+
     Args:
         ohlcv_list: List of OHLCV DataFrames
         model_out_path: Path to save model
         test_size: Test set fraction
         add_kd: Whether to include KD features
-        
+        model_type: "rf" (default) or "hgb"
+
     Returns:
         Training result dict
     """
-    result = train_random_forest(ohlcv_list, test_size=test_size, add_kd=add_kd)
-    
+    result = train_random_forest(ohlcv_list, test_size=test_size, add_kd=add_kd,
+                                 model_type=model_type)
+
     if result.get('model') is not None:
         metadata = {
             'feature_set_version': 'v1',
@@ -315,6 +360,9 @@ def fit_from_pooled(ohlcv_list: list, model_out_path: str,
             'metrics': result['metrics'],
             'rf_params': result.get('rf_params', {})
         }
-        save_model(result['model'], model_out_path, result['feature_cols'], metadata)
-    
+        # Tag from the estimator actually trained - small datasets fall
+        # back to RF even when hgb was requested
+        save_model(result['model'], model_out_path, result['feature_cols'], metadata,
+                   model_type='sklearn_hgb' if result.get('model_kind') == 'hgb' else 'sklearn_rf')
+
     return result
@@ -1,39 +1,55 @@
 import pandas as pd
-from ta.trend import SMAIndicator, MACD
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
+import numpy as np
 
 def add_technical_indicators(df):
     """
-    Adds technical indicators to the dataframe.
+    Returns a new dataframe with technical indicator columns added.
+
+    Indicators are computed directly with pandas rolling/ewm (same
+    formulations the ta library used), skipping its per-indicator
+    wrapper objects. The input dataframe is not mutated, so callers can
+    pass cached frames directly without a defensive .copy().
     """
     if df.empty:
         return df
 
-    # Moving Averages
-    df['MA5'] = SMAIndicator(close=df['Close'], window=5).sma_indicator()
-    df['MA20'] = SMAIndicator(close=df['Close'], window=20).sma_indicator()
-    df['MA60'] = SMAIndicator(close=df['Close'], window=60).sma_indicator()
-
-    # RSI
-    df['RSI'] = RSIIndicator(close=df['Close'], window=14).rsi()
-
-    # MACD
-    macd = MACD(close=df['Close'])
-    df['MACD'] = macd.macd()
-    df['MACD_Signal'] = macd.macd_signal()
-    df['MACD_Diff'] = macd.macd_diff()
-
-    # Bollinger Bands
-    bb = BollingerBands(close=df['Close'], window=20, window_dev=2)
-    df['BB_High'] = bb.bollinger_hband()
-    df['BB_Low'] = bb.bollinger_lband()
-    df['BB_Mid'] = bb.bollinger_mavg()
-
-    # KD (Stochastic Oscillator)
-    from ta.momentum import StochasticOscillator
-    stoch = StochasticOscillator(high=df['High'], low=df['Low'], close=df['Close'], window=9, smooth_window=3)
-    df['K'] = stoch.stoch()
-    df['D'] = stoch.stoch_signal()
-
-    return df
+    close = df['Close']
+
+    # RSI(14) - Wilder smoothing on gains/losses
+    delta = close.diff().to_numpy()
+    gain = pd.Series(np.where(delta > 0, delta, 0.0), index=df.index)
+    loss = pd.Series(np.where(delta < 0, -delta, 0.0), index=df.index)
+    avg_gain = gain.ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    avg_loss = loss.ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+
+    # MACD(12, 26, 9) - min_periods masks the warmup and seeds the
+    # signal EMA at the first valid MACD bar, matching ta's formulation
+    ema_fast = close.ewm(span=12, adjust=False, min_periods=12).mean()
+    ema_slow = close.ewm(span=26, adjust=False, min_periods=26).mean()
+    macd = ema_fast - ema_slow
+    macd_signal = macd.ewm(span=9, adjust=False, min_periods=9).mean()
+
+    # Bollinger Bands (20, 2)
+    bb_mid = close.rolling(window=20, min_periods=20).mean()
+    bb_std = close.rolling(window=20, min_periods=20).std(ddof=0)
+
+    # KD (Stochastic Oscillator, 9/3)
+    lowest_low = df['Low'].rolling(window=9, min_periods=9).min()
+    highest_high = df['High'].rolling(window=9, min_periods=9).max()
+    k = 100 * (close - lowest_low) / (highest_high - lowest_low)
+
+    return df.assign(
+        MA5=close.rolling(window=5, min_periods=5).mean(),
+        MA20=close.rolling(window=20, min_periods=20).mean(),
+        MA60=close.rolling(window=60, min_periods=60).mean(),
+        RSI=rsi,
+        MACD=macd,
+        MACD_Signal=macd_signal,
+        MACD_Diff=macd - macd_signal,
+        BB_High=bb_mid + 2 * bb_std,
+        BB_Low=bb_mid - 2 * bb_std,
+        BB_Mid=bb_mid,
+        K=k,
+        D=k.rolling(window=3, min_periods=3).mean(),
+    )